@@ -1,10 +1,296 @@
 import logging
+import os
+import re
 import time
 from abc import ABC, abstractmethod
-from threading import Thread, Lock as ThreadLock
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from threading import Thread
 from multiprocessing import Process, Queue
 from queue import Empty
 
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional
+    ahocorasick = None
+
+try:
+    from searcher_core import scan_file
+except ImportError:  # the extension is optional, see setup.py
+    scan_file = None
+
+# Above this number of key words one regular expression scan is faster than
+# looking up every key word separately.
+FIND_KEY_WORDS_MAX = 32
+
+
+@lru_cache(maxsize=None)
+def build_automaton(key_words):
+    """
+    Builds an Aho-Corasick automaton for the given key words.
+
+    Args:
+        key_words (Tuple[str]): The key words to search for.
+
+    Returns:
+        ahocorasick.Automaton: The automaton with every key word as a value, or None if pyahocorasick is not installed or there are no key words.
+
+    The automaton is built once per process for a given set of key words and reused for every file. Its keys are the UTF-8 bytes of the key words decoded as Latin-1, so it matches file content decoded the same way byte for byte.
+    """
+    if ahocorasick is None or not key_words:
+        return None
+    automaton = ahocorasick.Automaton()
+    for word in key_words:
+        automaton.add_word(word.encode().decode("latin-1"), word)
+    automaton.make_automaton()
+    return automaton
+
+
+def trie_to_regex(node):
+    """
+    Converts a trie of key words to a regular expression matching any of them.
+
+    Args:
+        node (Dict[Union[int, str], Any]): A trie node mapping bytes to child nodes, the "" key marks the end of a key word.
+
+    Returns:
+        bytes: The regular expression source.
+
+    Common prefixes appear only once in the expression, so the regular expression engine checks each of them once instead of once per key word. Longer key words are tried first.
+    """
+    branches = [
+        re.escape(bytes([byte])) + trie_to_regex(child)
+        for byte, child in sorted(
+            (byte, child) for byte, child in node.items() if byte != ""
+        )
+    ]
+    if not branches:
+        return b""
+    regex = (
+        branches[0] if len(branches) == 1 else b"(?:%s)" % b"|".join(branches)
+    )
+    return b"(?:%s)?" % regex if "" in node else regex
+
+
+@lru_cache(maxsize=None)
+def build_pattern(key_words):
+    """
+    Builds a regular expression finding every occurrence of the given key words.
+
+    Args:
+        key_words (Tuple[str]): The key words to search for, at least one.
+
+    Returns:
+        Tuple[re.Pattern, Dict[bytes, List[str]]]: The compiled pattern and, for every encoded key word, the key words it starts with (including itself).
+
+    The pattern searches UTF-8 encoded content. It is a lookahead, so it matches at every position where a key word starts and its group holds the longest key word starting there. Every other key word starting at the same position is a prefix of that one, so it is found in the returned mapping.
+    """
+    trie = {}
+    for word in key_words:
+        node = trie
+        for byte in word.encode():
+            node = node.setdefault(byte, {})
+        node[""] = word
+    prefixes = {}
+    for encoded in encode_key_words(key_words):
+        node = trie
+        prefixes[encoded] = [node[""]] if "" in node else []
+        for byte in encoded:
+            node = node[byte]
+            if "" in node:
+                prefixes[encoded].append(node[""])
+    return re.compile(b"(?=(%s))" % trie_to_regex(trie)), prefixes
+
+
+@lru_cache(maxsize=None)
+def encode_key_words(key_words):
+    """
+    Encodes the given key words to match them against file content read as bytes.
+
+    Args:
+        key_words (Tuple[str]): The key words to search for.
+
+    Returns:
+        Tuple[bytes]: The UTF-8 encoded key words.
+    """
+    return tuple(word.encode() for word in key_words)
+
+
+@lru_cache(maxsize=None)
+def first_bytes(key_words):
+    """
+    Collects the bytes the given key words start with.
+
+    Args:
+        key_words (Tuple[str]): The key words to search for.
+
+    Returns:
+        Tuple[int]: The distinct first bytes of the UTF-8 encoded key words.
+    """
+    return tuple(sorted({word[0] for word in encode_key_words(key_words)}))
+
+
+def scan_automaton(automaton, data):
+    """
+    Finds the lines of lowercased file content that contain the key words of the given automaton.
+
+    Args:
+        automaton (ahocorasick.Automaton): The automaton from build_automaton.
+        data (bytes): The lowercased file content.
+
+    Returns:
+        Dict[str, List[int]]: The ascending numbers of the lines containing each found key word.
+
+    The content is decoded as Latin-1 to match the keys of the automaton and scanned once as a whole.
+    """
+    found = {}
+    text = data.decode("latin-1")
+    i = last = 0
+    for end, word in automaton.iter(text):
+        i += text.count("\n", last, end)
+        last = end
+        lines = found.setdefault(word, [])
+        if not lines or lines[-1] != i:
+            lines.append(i)
+    return found
+
+
+@lru_cache(maxsize=None)
+def build_find_scanner(key_words):
+    """
+    Builds a function finding the lines of lowercased file content that contain the given key words by looking up each of them separately.
+
+    Args:
+        key_words (Tuple[str]): The key words to search for.
+
+    Returns:
+        Callable[[bytes], Dict[str, List[int]]]: The function returning the ascending numbers of the lines containing each found key word.
+
+    Each key word is looked up with bytes.find, which skips through the content in C, and the rest of a line is skipped after every hit.
+    """
+    needles = tuple(zip(key_words, encode_key_words(key_words)))
+
+    def scan(data):
+        found = {}
+        for word, needle in needles:
+            lines = []
+            i = last = 0
+            start = data.find(needle)
+            while start != -1:
+                i += data.count(b"\n", last, start)
+                last = start
+                lines.append(i)
+                end = data.find(b"\n", start)
+                if end == -1:
+                    break
+                start = data.find(needle, end + 1)
+            if lines:
+                found[word] = lines
+        return found
+
+    return scan
+
+
+@lru_cache(maxsize=None)
+def build_pattern_scanner(key_words):
+    """
+    Builds a function finding the lines of lowercased file content that contain the given key words with one regular expression scan.
+
+    Args:
+        key_words (Tuple[str]): The key words to search for.
+
+    Returns:
+        Callable[[bytes], Dict[str, List[int]]]: The function returning the ascending numbers of the lines containing each found key word.
+
+    The content is scanned once with the pattern from build_pattern, so the cost hardly grows with the number of key words. Without key words the function finds nothing.
+    """
+    if not key_words:
+        return lambda data: {}
+    pattern, prefixes = build_pattern(key_words)
+
+    def scan(data):
+        found = {}
+        i = last = 0
+        for match in pattern.finditer(data):
+            start = match.start()
+            i += data.count(b"\n", last, start)
+            last = start
+            for word in prefixes[match.group(1)]:
+                lines = found.setdefault(word, [])
+                if not lines or lines[-1] != i:
+                    lines.append(i)
+        return found
+
+    return scan
+
+
+def build_scanner(key_words):
+    """
+    Builds a function finding the lines of lowercased file content that contain the given key words.
+
+    Args:
+        key_words (Tuple[str]): The key words to search for.
+
+    Returns:
+        Callable[[bytes], Dict[str, List[int]]]: The function returning the ascending numbers of the lines containing each found key word.
+
+    Up to FIND_KEY_WORDS_MAX key words the function from build_find_scanner is returned, as looking up a few key words separately is faster. For more key words the function from build_pattern_scanner is returned.
+    """
+    if len(key_words) <= FIND_KEY_WORDS_MAX:
+        return build_find_scanner(key_words)
+    return build_pattern_scanner(key_words)
+
+
+def read_lowered(file_name):
+    """
+    Reads the specified file and lowercases its content for matching.
+
+    Args:
+        file_name (Union[str, os.PathLike]): The name of the file to read.
+
+    Raises:
+        FileNotFoundError: If the specified file is not found.
+
+    Returns:
+        bytes: The lowercased, UTF-8 encoded content with "\\n" line ends.
+
+    ASCII content is lowercased as bytes. Other content is decoded as UTF-8 and lowercased with str.lower, so every letter is folded as in a file opened in text mode; this never adds or removes newlines, so line numbers are kept. Bytes that are not valid UTF-8 are kept as they are. "\\r\\n" and lone "\\r" line ends are replaced with "\\n", as text mode does.
+    """
+    with open(file_name, "rb", buffering=1 << 16) as f:
+        data = f.read()
+    if b"\r" in data:
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    if data.isascii():
+        return data.lower()
+    text = data.decode(errors="surrogateescape")
+    return text.lower().encode(errors="surrogateescape")
+
+
+def prefetch_files(files):
+    """
+    Asks the kernel to start reading the given files into the page cache.
+
+    Args:
+        files (List[str]): A list of file names.
+
+    Returns:
+        None
+
+    The reads are queued for all files at once and run in the background, so the disk gets many requests at a time while the workers are starting and searching the first files. Missing files are skipped. Does nothing where os.posix_fadvise is not available.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for file_name in files:
+        try:
+            fd = os.open(file_name, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
 
 class SearcherBase(ABC):
     """
@@ -20,9 +306,13 @@ class SearcherBase(ABC):
         :param key_words: A list of key words to search for in the files.
         :type key_words: List[str]
         :return: None
+
+        Key words are lowercased once here, as every line is lowercased before matching, and duplicates and empty key words are dropped.
         """
         self.files = files
-        self.key_words = key_words
+        self.key_words = list(
+            dict.fromkeys(word.lower() for word in key_words if word)
+        )
         self.results = list()
         self.time = 0
 
@@ -38,17 +328,49 @@ class SearcherBase(ABC):
         Raises:
             FileNotFoundError: If the specified file is not found.
 
-        This function opens the specified file in read mode and searches for the given key words in each line of the file. If a key word is found in a line, the corresponding tuple (word, file_name, line_number) is pushed to the results list.
+        This function searches for the given key words in each line of the file. If a key word is found in a line, the corresponding tuple (word, file_name, line_number) is pushed to the results list.
+        The tuples of one file are pushed in sorted order.
         """
         try:
-            with open(file_name, "r") as f:
-                for i, line in enumerate(f):
-                    line = line.lower()
-                    for word in key_words:
-                        if word in line:
-                            self.push_results((word, file_name, i), extra_arg)
+            found = self.find_lines(file_name, key_words)
         except FileNotFoundError:
             logging.error(f"File {file_name} not found")
+            return
+        for word in sorted(found):
+            for i in found[word]:
+                self.push_results((word, file_name, i), extra_arg)
+
+    def find_lines(self, file_name, key_words):
+        """
+        Finds the lines of the specified file containing the given key words.
+
+        Args:
+            file_name (str): The name of the file to search in.
+            key_words (List[str]): The list of key words to search for.
+
+        Raises:
+            FileNotFoundError: If the specified file is not found.
+
+        Returns:
+            Dict[str, List[int]]: The ascending numbers of the lines containing each found key word.
+
+        The file is read and lowercased with read_lowered.
+        The compiled searcher_core extension does the whole search of ASCII files when it is built. Otherwise the whole file content is scanned once with an Aho-Corasick automaton when pyahocorasick is installed, or with the function from build_scanner. The content is not split into lines; the line number of a match is counted from the newlines since the previous match. A file containing none of the bytes the key words start with is not scanned at all.
+        """
+        found = {}
+        if scan_file is not None:
+            hits = scan_file(file_name, encode_key_words(tuple(key_words)))
+            if hits is not None:
+                for index, i in hits:
+                    found.setdefault(key_words[index], []).append(i)
+                return found
+        automaton = build_automaton(tuple(key_words))
+        data = read_lowered(file_name)
+        if not any(byte in data for byte in first_bytes(tuple(key_words))):
+            return found
+        if automaton is not None:
+            return scan_automaton(automaton, data)
+        return build_scanner(tuple(key_words))(data)
 
     def worker(self, files, key_words, extra_arg=None):
         """
@@ -76,6 +398,8 @@ class SearcherBase(ABC):
 
         :param n_workers: The number of workers for parallel processing. Defaults to 1.
         :return: The instance of the SearcherBase class.
+
+        The results of every file are already sorted, so sorting all results only merges these runs.
         """
         _time_ = time.time()
         self.start_workers(n_workers)
@@ -167,8 +491,9 @@ class MultiThreadSearcher(SearcherBase):
             None
 
         This function creates a specified number of worker threads and distributes the files to be searched among them. Each thread is given a portion of the files to search and the key words to search for. The threads are then started and joined to ensure all threads have completed their work before the function returns.
+        Each thread collects its results in its own list, and the lists are merged after all threads are joined.
         """
-        self.locker = ThreadLock()
+        thread_results = [[] for _ in range(n_workers)]
         threads = []
         files_per_worker = (len(self.files) + n_workers - 1) // n_workers
         for i in range(n_workers):
@@ -179,38 +504,72 @@ class MultiThreadSearcher(SearcherBase):
                         i * files_per_worker : (i + 1) * files_per_worker
                     ],
                     self.key_words,
+                    thread_results[i],
                 ),
             )
             t.start()
             threads.append(t)
         [t.join() for t in threads]
+        for results in thread_results:
+            self.results.extend(results)
 
     def push_results(self, data, extra_arg=None):
         """
-        Pushes the given data to the results list.
+        Pushes the given data to the results list of the current thread.
 
         Args:
             data (Any): The data to be pushed.
-            extra_arg (Any, optional): An optional extra argument. Defaults to None.
+            extra_arg (List): The results list of the current thread.
 
         Returns:
             None
 
-        This function appends the given data to the `results` list in a thread-safe manner. It uses a lock to ensure that only one thread can access the list at a time.
+        No lock is needed, as every thread appends to its own list only.
         """
-        with self.locker:
-            self.results.append(data)
+        extra_arg.append(data)
+
+
+_pool_searcher = None
+
+
+def _init_pool_worker(searcher):
+    """
+    Stores the searcher used by the pool worker process.
+
+    Args:
+        searcher (SearcherBase): The searcher whose settings are used for every file.
+
+    Returns:
+        None
+    """
+    global _pool_searcher
+    _pool_searcher = searcher
+
+
+def _search_file(file_name):
+    """
+    Searches for the key words of the pool worker searcher in one file.
+
+    Args:
+        file_name (str): The name of the file to search in.
+
+    Returns:
+        List[Tuple[str, str, int]]: The found words.
+    """
+    results = []
+    _pool_searcher.worker([file_name], _pool_searcher.key_words, results)
+    return results
 
 
 class MultiProcessSearcher(SearcherBase):
     """
     Class representing a searcher that searches for key words in files using multiple processes.
-    Each process is given a portion of the files to search.
+    Files are handed out to a pool of processes one at a time, so a large file does not hold up the files queued after it.
     """
 
     def start_workers(self, n_workers=1):
         """
-        Starts a specified number of worker processes to perform a search operation.
+        Starts a pool of worker processes to perform a search operation.
 
         Args:
             n_workers (int, optional): The number of worker processes to start. Defaults to 1.
@@ -218,48 +577,36 @@ class MultiProcessSearcher(SearcherBase):
         Returns:
             None
 
-        This function creates multiple worker processes to distribute the files for searching. Each process is given a subset of files to search and the key words to look for. The processes are started concurrently, and the function waits for all processes to finish before completing.
+        This function submits every file as a separate task to a process pool. Each idle process takes the next file, and the results of each file are returned to the main process as one list. Reading of all files is requested from the kernel before the pool starts.
         """
-        processes = []
-        queue = Queue()
-        files_per_worker = (len(self.files) + n_workers - 1) // n_workers
-        for i in range(n_workers):
-            p = Process(
-                target=self.worker,
-                args=(
-                    self.files[
-                        i * files_per_worker : (i + 1) * files_per_worker
-                    ],
-                    self.key_words,
-                    queue,
-                ),
-            )
-            p.start()
-            processes.append(p)
-        while any(p.is_alive() for p in processes):
-            if not queue.empty():
-                self.results.append(queue.get())
-        while not queue.empty():
-            self.results.append(queue.get())
+        prefetch_files(self.files)
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_pool_worker,
+            initargs=(self,),
+        ) as executor:
+            for results in executor.map(_search_file, self.files, chunksize=1):
+                self.results.extend(results)
 
-    def push_results(self, data, queue: Queue):
+    def push_results(self, data, extra_arg=None):
         """
-        Pushes the given data to the specified queue.
+        Pushes the given data to the results list of the file being searched.
 
         Args:
-            data: The data to be pushed.
-            queue: The queue to which the data will be pushed.
+            data (Any): The data to be pushed.
+            extra_arg (List): The results list of the current task.
 
         Returns:
             None
         """
-        queue.put(data)
+        extra_arg.append(data)
 
 
-class MultiProcessSearcher2(MultiProcessSearcher):
+class MultiProcessSearcher2(SearcherBase):
     """
     Class representing a searcher that searches for key words in files using multiple processes.
     Each process is taking files to search in from a queue.
+    Each process stores its results as (key word index, file index, line number) integer records and hands them to the main process in one array.
     """
 
     def worker(self, files, key_words, extra_arg=None):
@@ -274,37 +621,106 @@ class MultiProcessSearcher2(MultiProcessSearcher):
         Returns:
             None
 
-        This function takes the next file from the queue until it is not empty. If an error occurs during the execution of the search_words function, an error message is logged.
+        This function takes the next file from the queue until it gets a None sentinel, then sends its results and a None sentinel to the results queue. If an error occurs during the execution of the search_words function, an error message is logged.
         """
+        self.records = array("I")
+        self.word_ids = {word: i for i, word in enumerate(self.key_words)}
+        self.file_ids = {fname: i for i, fname in enumerate(self.files)}
         try:
-            while True:
-                self.search_words(files.get(block=False), key_words, extra_arg)
-        except Empty:
-            pass
+            for fname in iter(files.get, None):
+                self.search_words(fname, key_words, extra_arg)
         except Exception as err:
             logging.error(f"Worker error: {err}")
+        finally:
+            self.finish_worker(extra_arg)
 
     def start_workers(self, n_workers=1):
         """
         Initiates the search process using the specified number of workers.
         :param n_workers: The number of workers for parallel processing. Defaults to 1.
         """
+        prefetch_files(self.files)
         processes = []
         files_queue = Queue()
         queue = Queue()
         for f in self.files:
             files_queue.put(f)
+        for _ in range(n_workers):
+            files_queue.put(None)
         for _ in range(n_workers):
             p = Process(
                 target=self.worker, args=(files_queue, self.key_words, queue)
             )
             p.start()
             processes.append(p)
-        while any(p.is_alive() for p in processes):
-            if not queue.empty():
-                self.results.append(queue.get())
-        while not queue.empty():
-            self.results.append(queue.get())
+        self.collect_results(queue, processes)
+
+    def finish_worker(self, queue):
+        """
+        Sends the results of the worker and a None sentinel to the results queue.
+
+        Args:
+            queue (Queue): The results queue.
+
+        Returns:
+            None
+
+        The records are put to the queue as one array, which is pickled as its raw bytes instead of one object per found word.
+        """
+        if self.records:
+            queue.put(self.records)
+        queue.put(None)
+
+    def collect_results(self, queue, processes):
+        """
+        Collects the results pushed by the worker processes until every worker has finished.
+
+        Args:
+            queue (Queue): The results queue.
+            processes (List[Process]): The started worker processes.
+
+        Returns:
+            None
+
+        This function blocks on the queue instead of polling it. Each worker puts a None sentinel when it is done, so collecting stops after one sentinel per worker. If the queue stays empty and no worker is alive anymore (e.g. a worker was killed), collecting stops as well.
+        The integer records of the workers are turned back into (word, file_name, line_number) tuples.
+        """
+        done = 0
+        while done < len(processes):
+            try:
+                data = queue.get(timeout=1)
+            except Empty:
+                if not any(p.is_alive() for p in processes):
+                    break
+                continue
+            if data is None:
+                done += 1
+                continue
+            self.results.extend(
+                zip(
+                    map(self.key_words.__getitem__, data[0::3]),
+                    map(self.files.__getitem__, data[1::3]),
+                    data[2::3],
+                )
+            )
+        for p in processes:
+            p.join()
+
+    def push_results(self, data, queue: Queue):
+        """
+        Stores the given data as an integer record of the worker.
+
+        Args:
+            data: The (word, file_name, line_number) tuple to be stored.
+            queue: The results queue, not used until the worker finishes.
+
+        Returns:
+            None
+        """
+        word, file_name, line_number = data
+        self.records.extend(
+            (self.word_ids[word], self.file_ids[file_name], line_number)
+        )
 
 
 def main():
@@ -0,0 +1,189 @@
+# cython: language_level=3
+from libc.stdlib cimport malloc, realloc, free
+
+# Maps every byte to itself with ASCII capitals replaced by lowercase letters.
+cdef unsigned char LOWER[256]
+for _byte in range(256):
+    LOWER[_byte] = _byte + 32 if ord("A") <= _byte <= ord("Z") else _byte
+
+cdef struct Trie:
+    # Node 0 is the root. Children of a node are a linked list starting at
+    # first_child and continuing through next_sibling, -1 ends the list.
+    Py_ssize_t size
+    unsigned char *label
+    Py_ssize_t *first_child
+    Py_ssize_t *next_sibling
+    Py_ssize_t *word
+
+
+cdef struct Hits:
+    # Found (key word index, line number) pairs stored one after another.
+    Py_ssize_t size
+    Py_ssize_t capacity
+    Py_ssize_t *data
+
+
+cdef int hits_add(Hits *hits, Py_ssize_t index,
+                  Py_ssize_t line_number) noexcept nogil:
+    cdef Py_ssize_t capacity
+    cdef Py_ssize_t *data
+    if hits.size == hits.capacity:
+        capacity = hits.capacity * 2 if hits.capacity else 1024
+        data = <Py_ssize_t *>realloc(
+            hits.data, 2 * capacity * sizeof(Py_ssize_t)
+        )
+        if data == NULL:
+            return -1
+        hits.data = data
+        hits.capacity = capacity
+    hits.data[2 * hits.size] = index
+    hits.data[2 * hits.size + 1] = line_number
+    hits.size += 1
+    return 0
+
+
+cdef int trie_init(Trie *trie, Py_ssize_t capacity):
+    trie.size = 1
+    trie.label = <unsigned char *>malloc(capacity * sizeof(unsigned char))
+    trie.first_child = <Py_ssize_t *>malloc(capacity * sizeof(Py_ssize_t))
+    trie.next_sibling = <Py_ssize_t *>malloc(capacity * sizeof(Py_ssize_t))
+    trie.word = <Py_ssize_t *>malloc(capacity * sizeof(Py_ssize_t))
+    if (trie.label == NULL or trie.first_child == NULL
+            or trie.next_sibling == NULL or trie.word == NULL):
+        return -1
+    trie.label[0] = 0
+    trie.first_child[0] = -1
+    trie.next_sibling[0] = -1
+    trie.word[0] = -1
+    return 0
+
+
+cdef void trie_free(Trie *trie):
+    free(trie.label)
+    free(trie.first_child)
+    free(trie.next_sibling)
+    free(trie.word)
+
+
+cdef inline Py_ssize_t trie_child(Trie *trie, Py_ssize_t node,
+                                  unsigned char c) nogil:
+    cdef Py_ssize_t child = trie.first_child[node]
+    while child != -1 and trie.label[child] != c:
+        child = trie.next_sibling[child]
+    return child
+
+
+cdef void trie_add(Trie *trie, const unsigned char *word, Py_ssize_t length,
+                   Py_ssize_t index):
+    cdef Py_ssize_t node = 0, child, k
+    for k in range(length):
+        child = trie_child(trie, node, word[k])
+        if child == -1:
+            child = trie.size
+            trie.size += 1
+            trie.label[child] = word[k]
+            trie.first_child[child] = -1
+            trie.next_sibling[child] = trie.first_child[node]
+            trie.word[child] = -1
+            trie.first_child[node] = child
+        node = child
+    if trie.word[node] == -1:
+        trie.word[node] = index
+
+
+cdef int scan(const unsigned char *buf, Py_ssize_t size, Trie *trie,
+              Py_ssize_t *first, Py_ssize_t *last_line,
+              Hits *hits) noexcept nogil:
+    # Returns -1 if hits could not grow.
+    cdef const unsigned char *label = trie.label
+    cdef const Py_ssize_t *first_child = trie.first_child
+    cdef const Py_ssize_t *next_sibling = trie.next_sibling
+    cdef const Py_ssize_t *word = trie.word
+    cdef Py_ssize_t p, q, node, index, line_number = 0
+    cdef unsigned char c
+    for p in range(size):
+        node = first[buf[p]]
+        q = p
+        while node != -1:
+            index = word[node]
+            if index != -1 and last_line[index] != line_number:
+                last_line[index] = line_number
+                if hits_add(hits, index, line_number) < 0:
+                    return -1
+            q += 1
+            if q == size:
+                break
+            c = LOWER[buf[q]]
+            node = first_child[node]
+            while node != -1 and label[node] != c:
+                node = next_sibling[node]
+        if buf[p] == ord("\n"):
+            line_number += 1
+    return 0
+
+
+def scan_file(file_name, key_words):
+    """
+    Searches for the given key words in each line of the specified file.
+
+    Args:
+        file_name (Union[str, os.PathLike]): The name of the file to search in.
+        key_words (Sequence[bytes]): The lowercased, non-empty key words to search for.
+
+    Raises:
+        FileNotFoundError: If the specified file is not found.
+
+    Returns:
+        List[Tuple[int, int]]: The (key word index, line number) pairs of the found words, or None if the file is not ASCII text.
+
+    The file is read at once and its bytes are lowercased (ASCII only) through a lookup table while matching, without copying the content. The key words are put into a byte trie, which is walked from every position of the content, so each byte is compared against all key words sharing a prefix at once. The trie node of the first byte is looked up in a 256-entry table, so positions where no key word starts are rejected with a single lookup.
+    The search runs without the GIL, so threads searching different files run in parallel.
+    Only ASCII letters are lowercased here, so files with other characters are left to the caller.
+    "\\r\\n" and lone "\\r" line ends count as one line end, as in text mode.
+    """
+    with open(file_name, "rb") as f:
+        data = f.read()
+    if not data.isascii():
+        return None
+    if b"\r" in data:
+        data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    cdef list words = [bytes(word) for word in key_words]
+    cdef Py_ssize_t n_words = len(words)
+    cdef const unsigned char *buf = data
+    cdef Py_ssize_t size = len(data)
+    cdef Py_ssize_t capacity = 1
+    cdef Py_ssize_t p, index
+    cdef int status
+    cdef Py_ssize_t *last_line = NULL
+    cdef Py_ssize_t first[256]
+    cdef Trie trie
+    cdef Hits hits = Hits(0, 0, NULL)
+    cdef bytes word
+    for word in words:
+        capacity += len(word)
+    if trie_init(&trie, capacity) < 0:
+        trie_free(&trie)
+        raise MemoryError()
+    try:
+        last_line = <Py_ssize_t *>malloc((n_words + 1) * sizeof(Py_ssize_t))
+        if last_line == NULL:
+            raise MemoryError()
+        for index in range(n_words):
+            last_line[index] = -1
+            word = words[index]
+            if b"\n" not in word:
+                trie_add(&trie, word, len(word), index)
+        for index in range(256):
+            first[index] = trie_child(&trie, 0, LOWER[index])
+        with nogil:
+            status = scan(buf, size, &trie, first, last_line, &hits)
+        if status < 0:
+            raise MemoryError()
+        results = [
+            (hits.data[2 * p], hits.data[2 * p + 1]) for p in range(hits.size)
+        ]
+    finally:
+        free(hits.data)
+        free(last_line)
+        trie_free(&trie)
+    return results
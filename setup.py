@@ -0,0 +1,7 @@
+from setuptools import Extension, setup
+from Cython.Build import cythonize
+
+setup(
+    name="searcher-core",
+    ext_modules=cythonize([Extension("searcher_core", ["searcher_core.pyx"])]),
+)
@@ -1,8 +1,14 @@
 import logging
 from prepare_data import prepare_data
+from searcher import build_automaton, build_find_scanner
+from searcher import build_pattern_scanner, encode_key_words
+from searcher import read_lowered, scan_automaton, scan_file
 from searcher import SingleThreadSearcher, MultiThreadSearcher
 from searcher import MultiProcessSearcher, MultiProcessSearcher2
 
+# Overlapping key words and key words that are prefixes of each other.
+OVERLAPPING_KEY_WORDS = ["ab", "abc", "abcd", "he", "her", "here", "ere"]
+
 
 def print_results(searcher, detailed=False):
     """
@@ -56,6 +62,108 @@ def save_results(fname, results):
         )
 
 
+def find_lines_per_line(file_name, key_words):
+    """
+    Find the lines of a file containing the key words by checking every key word in every line.
+
+    Parameters:
+        file_name (str): The name of the file to search in.
+        key_words (List[str]): The lowercased key words to search for.
+
+    Returns:
+        Dict[str, List[int]]: The ascending numbers of the lines containing each found key word.
+
+    This is the plain search the searchers started from, used as the reference for the faster backends.
+    """
+    found = {}
+    with open(file_name, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            line = line.lower()
+            for word in key_words:
+                if word in line:
+                    found.setdefault(word, []).append(i)
+    return found
+
+
+def check_backends(files, key_words):
+    """
+    Compare every search backend with the plain per-line search.
+
+    Parameters:
+        files (List[str]): The names of the files to search in.
+        key_words (List[str]): The key words to search for.
+
+    Returns:
+        bool: True if any backend found different lines than the per-line search.
+
+    The searchers all use the same backend, so comparing them with each other does not catch a backend bug. This function runs each backend directly on every file: bytes.find, the regular expression, the Aho-Corasick automaton when pyahocorasick is installed, the searcher_core extension when it is built and SearcherBase.find_lines, which picks one of them. The key words are extended with OVERLAPPING_KEY_WORDS. A backend that differs is logged as an error.
+    """
+    key_words = tuple(
+        dict.fromkeys(
+            [word.lower() for word in key_words] + OVERLAPPING_KEY_WORDS
+        )
+    )
+    backends = {
+        "bytes.find": build_find_scanner(key_words),
+        "regex": build_pattern_scanner(key_words),
+    }
+    searcher = SingleThreadSearcher(files, key_words)
+    automaton = build_automaton(key_words)
+    if automaton is not None:
+        backends["automaton"] = lambda data: scan_automaton(automaton, data)
+    failed = False
+    for file_name in files:
+        expected = find_lines_per_line(file_name, key_words)
+        data = read_lowered(file_name)
+        results = {name: scan(data) for name, scan in backends.items()}
+        results["find_lines"] = searcher.find_lines(
+            file_name, searcher.key_words
+        )
+        hits = None
+        if scan_file is not None:
+            hits = scan_file(file_name, encode_key_words(key_words))
+        if hits is not None:
+            found = {}
+            for index, i in hits:
+                found.setdefault(key_words[index], []).append(i)
+            results["searcher_core"] = found
+        for name, found in results.items():
+            if found != expected:
+                logging.error(
+                    f"{name} results in {file_name} are not equal to the per-line search results"
+                )
+                failed = True
+    return failed
+
+
+def run_overlapping_test(test_name="OVERLAP"):
+    """
+    Run check_backends on a file where the overlapping key words occur next to each other.
+
+    Parameters:
+        test_name (str, optional): The name of the test. Defaults to "OVERLAP".
+
+    Returns:
+        None
+
+    The generated text hardly contains some of OVERLAPPING_KEY_WORDS, so this function writes small files with them in mixed case, overlapping each other, at line ends and after empty lines, and compares the backends on them. The files also have "\\r\\n" and lone "\\r" line ends and non-ASCII letters in mixed case, and one file contains none of the bytes the key words start with, so find_lines skips it.
+    """
+    logging.info(f"Run test {test_name}")
+    data = {
+        f"{test_name}_data_0.txt": "abcd ABC ab\nxabcabcdx\n\naab abab\n"
+        "there here Her\r\nabc\rABCD\r\n",
+        f"{test_name}_data_1.txt": "abc ПРИВІТ\r\nÄrger\nhere привіт ärger\n",
+        f"{test_name}_data_2.txt": "1234 5678\n90\n",
+    }
+    for file_name, text in data.items():
+        with open(file_name, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+    failed = check_backends(list(data), ["привіт", "ärger"])
+    logging.info(
+        f"Test '{test_name}': {'PASSED' if not failed else 'FAILED'}\n"
+    )
+
+
 def run_tests(
     files_number,
     lines_number_max,
@@ -81,11 +189,12 @@ def run_tests(
     2. Generates the file name pattern and key words file name based on the test name.
     3. Reads the key words from the key words file.
     4. Generates the list of files based on the file name pattern and the number of files.
-    5. Performs search using SingleThreadSearcher and prints the results.
-    6. Compares the results of SingleThreadSearcher with MultiThreadSearcher. If they are not equal, saves the MultiThreadSearcher results and logs an error.
-    7. Compares the results of SingleThreadSearcher with MultiProcessSearcher. If they are not equal, saves the MultiProcessSearcher results and logs an error.
-    8. Compares the results of SingleThreadSearcher with MultiProcessSearcher2. If they are not equal, saves the MultiProcessSearcher2 results and logs an error.
-    9. Prints the test result as "PASSED" if no errors occurred, otherwise logs "FAILED".
+    5. Compares every search backend with the plain per-line search using check_backends.
+    6. Performs search using SingleThreadSearcher and prints the results.
+    7. Compares the results of SingleThreadSearcher with MultiThreadSearcher. If they are not equal, saves the MultiThreadSearcher results and logs an error.
+    8. Compares the results of SingleThreadSearcher with MultiProcessSearcher. If they are not equal, saves the MultiProcessSearcher results and logs an error.
+    9. Compares the results of SingleThreadSearcher with MultiProcessSearcher2. If they are not equal, saves the MultiProcessSearcher2 results and logs an error.
+    10. Prints the test result as "PASSED" if no errors occurred, otherwise logs "FAILED".
     """
     logging.info(f"Run test {test_name}")
     logging.info(
@@ -107,11 +216,12 @@ def run_tests(
         key_words = kwords_f.read().split()
     files = [file_name_pattern.format(i) for i in range(files_number)]
 
+    failed = check_backends(files, key_words)
+
     single_thread_searcher = SingleThreadSearcher(files, key_words).search(
         n_workers
     )
     single_thread_searcher.print_results()
-    failed = False
 
     multi_thread_searcher = MultiThreadSearcher(files, key_words).search(
         n_workers
@@ -167,6 +277,7 @@ def run_tests(
 
 
 def main():
+    run_overlapping_test()
     run_tests(2, 20, n_workers=1, test_name="BASIC", generate_data=True)
     run_tests(8, 1_000, n_workers=2, test_name="MEDIUM", generate_data=True)
     run_tests(16, 10_000, n_workers=4, test_name="MAX", generate_data=True)